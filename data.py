@@ -1,12 +1,57 @@
+import hashlib
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import os.path
+import tempfile
 # import queue
 import quandl
 
 from abc import ABCMeta, abstractmethod
+from pyarrow import csv as pa_csv
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from event import MarketEvent
 from datetime import datetime
 from enum import Enum
+from itertools import repeat
+
+# MarketEvent carries no payload, so one instance is reused for every tick
+_MARKET_EVENT = MarketEvent()
+
+
+def _write_parquet(df, path):
+    """
+    Writes a parsed frame to a Parquet cache file. The frame is written
+    to a temporary file next to it and then moved into place, so a
+    crashed or concurrent run never leaves a partial cache behind. The
+    cache is only an optimisation, so a failed write (e.g. a read-only
+    directory or a full disk) is otherwise ignored.
+    """
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                        suffix='.tmp')
+        os.close(fd)
+        df.to_parquet(tmp_path, compression='snappy')
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _read_parquet(path):
+    """
+    Reads a Parquet cache file, returning None if it cannot be read
+    (e.g. it is truncated or not a Parquet file at all) so that the
+    caller falls back to the original data and rewrites the cache.
+    """
+    try:
+        return pd.read_parquet(path)
+    except (OSError, ValueError, pa.ArrowException):
+        return None
 
 
 class DataSource(Enum):
@@ -32,8 +77,16 @@ class DataHandler(metaclass=ABCMeta):
     @abstractmethod
     def get_latest_data(self, symbol, N=1):
         """
-        Returns the last N bars from the latest_symbol list,
-        or fewer if less bars are available.
+        Returns the last N bars as (symbol, pd.Timestamp, close)
+        tuples, or fewer if less bars are available.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_latest_arrays(self, symbol, N=1):
+        """
+        Returns the last N timestamps and close prices as a tuple
+        of arrays, or fewer if less bars are available.
         """
         raise NotImplementedError
 
@@ -46,7 +99,140 @@ class DataHandler(metaclass=ABCMeta):
         raise NotImplementedError
 
 
-class HistoricCSVDataHandler(DataHandler):
+class HistoricDataHandler(DataHandler):
+    """
+    HistoricDataHandler replays historic close prices tick by tick
+    from a single (tick, symbol) matrix.
+
+    Derived handlers only load and clean their data into symbol_data
+    and then call _build_close_matrix; the replay itself is shared.
+    """
+    def get_latest_data(self, symbol, N=1):
+        """
+        Returns the last N bars replayed so far as
+        (symbol, pd.Timestamp, close) tuples, or fewer if less bars
+        are available. Prices are stored as float32, so each close
+        only carries float32 precision (1211.79 comes back as
+        1211.7900390625). They are returned as float64 so that the
+        arithmetic done on them is not itself carried out in float32.
+        Raises KeyError for a symbol that is not in the symbol list.
+        """
+        _, close = self.get_latest_arrays(symbol, N)
+        dates = self.ts_index[:self.tick][-N:]
+        return list(zip(repeat(symbol), dates, close.astype(np.float64)))
+
+    def get_latest_arrays(self, symbol, N=1):
+        """
+        Returns the last N timestamps and close prices replayed so
+        far as a tuple of zero-copy views into the close matrix. The
+        prices are the stored float32 values.
+        Raises KeyError if the symbol is not in the symbol list.
+        """
+        s = self.symbol_ids[symbol]
+        return (self.ts_array[:self.tick][-N:],
+                self.close_matrix[:self.tick, s][-N:])
+
+    def update_latest_data(self):
+        """
+        Advances the replay by one tick, making the next row of the
+        close matrix available for all symbols in the symbol list.
+        """
+        if self.tick < len(self.ts_array):
+            self.tick += 1
+        else:
+            self.continue_backtest = False
+        self.events.append(_MARKET_EVENT)
+
+    def _combine_indices(self):
+        """
+        Returns the sorted union of the date indices of all symbols,
+        built with a single concatenation rather than pairwise unions.
+        """
+        indices = [self.symbol_data[symbol].index
+                   for symbol in self.symbol_list]
+        return indices[0].append(indices[1:]).unique().sort_values()
+
+    def _build_close_matrix(self, combined_index):
+        """
+        Aligns the close prices of all symbols to the combined index,
+        padding each symbol forward with its last known price, and
+        stacks them into a single (tick, symbol) matrix sharing one
+        timestamp array, so that every tick of the replay is one
+        contiguous row.
+        """
+        self.symbol_ids = {symbol: i for i, symbol in
+                           enumerate(self.symbol_list)}
+        self.ts_array = combined_index.values.astype('datetime64[ns]')
+        self.ts_index = pd.DatetimeIndex(self.ts_array, name='Date')
+        self.close_matrix = np.empty(
+            (len(self.ts_array), len(self.symbol_list)), dtype=np.float32
+        )
+
+        for i, symbol in enumerate(self.symbol_list):
+            # searchsorted needs each source in date order, which neither
+            # Yahoo exports nor Quandl downloads are guaranteed to be.
+            df = self.symbol_data[symbol].sort_index()
+            src_ts = df.index.values.astype('datetime64[ns]')
+            src_close = df['Close'].to_numpy(dtype=np.float32)
+            if len(src_close) == 0:
+                # e.g. every close was filtered out as non-positive
+                self.close_matrix[:, i] = np.nan
+            else:
+                # Position of the last bar at or before each combined
+                # tick, or -1 if the symbol has no data yet.
+                pad = np.searchsorted(src_ts, self.ts_array,
+                                      side='right') - 1
+                self.close_matrix[:, i] = np.where(
+                    pad >= 0, src_close[pad.clip(0)], np.nan
+                )
+
+            # A view onto the matrix column, not a copy of it
+            self.symbol_dataframe[symbol] = pd.DataFrame(
+                self.close_matrix[:, i:i + 1], index=combined_index,
+                columns=['Close'], copy=False
+            )
+            self.all_data[symbol] = self.symbol_dataframe[symbol]
+        self.tick = 0
+
+    def create_baseline_dataframe(self):
+        """
+        Returns the cumulative return of holding each symbol over the
+        whole backtest, computed in one pass over the close matrix.
+        """
+        closes = pd.DataFrame(self.close_matrix, index=self.ts_index,
+                              columns=self.symbol_list)
+        # Missing closes are padded forward so the return across a gap is
+        # kept; only the ticks before a symbol's first bar stay NaN.
+        returns = closes.ffill().pct_change(fill_method=None)
+        return (1.0 + returns).cumprod()
+
+    def run_vectorized(self, strategy_fn):
+        """
+        Backtests a strategy over the whole close matrix in a single
+        vectorized pass, bypassing the event-driven tick replay.
+        Returns the cumulative profit and loss indexed by date.
+
+        Parameters:
+        strategy_fn - A function taking the (tick, symbol) close matrix,
+                      padded forward over missing closes, and returning
+                      an equally shaped array holding the position in
+                      each symbol after every tick.
+        """
+        # Padding keeps the price move across a missing close; only the
+        # ticks before a symbol's first bar stay NaN and contribute nothing.
+        closes = pd.DataFrame(self.close_matrix).ffill().to_numpy()
+        signals = np.asarray(strategy_fn(closes))
+        if signals.shape != closes.shape:
+            raise ValueError(
+                "strategy_fn returned signals of shape %s, expected %s"
+                % (signals.shape, closes.shape)
+            )
+        pnl = np.nansum(signals[:-1] * np.diff(closes, axis=0),
+                        axis=1, dtype=np.float64).cumsum()
+        return pd.Series(pnl, index=self.ts_index[1:], name='PnL')
+
+
+class HistoricCSVDataHandler(HistoricDataHandler):
     """
     HistoricCSVDataHandler is designed to read CSV files for
     each requested symbol from disk and provide an interface
@@ -72,7 +258,6 @@ class HistoricCSVDataHandler(DataHandler):
 
         self.symbol_data = {}
         self.symbol_dataframe = {}
-        self.latest_symbol_data = {}
         self.all_data = {}
         self.continue_backtest = True
 
@@ -89,116 +274,124 @@ class HistoricCSVDataHandler(DataHandler):
         For this handler it will be assumed that the data is
         taken from DTN IQFeed. Thus its format will be respected.
         """
-        combined_index = None
-        for symbol in self.symbol_list:
-            if source == DataSource.NASDAQ:
-                self.parse_nasdaq_csv(symbol)
-            else:
-                self.parse_yahoo_csv(symbol)
+        if source == DataSource.NASDAQ:
+            parse = self.parse_nasdaq_csv
+        else:
+            parse = self.parse_yahoo_csv
 
-            if combined_index is None:
-                combined_index = self.symbol_data[symbol].index
-            else:
-                combined_index.union(self.symbol_data[symbol].index)
+        # pyarrow's CSV reader and the pandas C parser both
+        # parse without holding the GIL, so the symbols can be loaded
+        # concurrently. Each call writes only its own symbol key.
+        max_workers = min(len(self.symbol_list), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(parse, self.symbol_list))
 
-            self.latest_symbol_data[symbol] = []
+        self._build_close_matrix(self._combine_indices())
 
-        for symbol in self.symbol_list:
-            self.symbol_dataframe[symbol] = self.symbol_data[symbol].reindex(
-                index=combined_index, method='pad'
-            )
-            self.all_data[symbol] = self.symbol_dataframe[symbol].copy()
-            self.symbol_data[symbol] = self.symbol_dataframe[symbol].iterrows()
+    def _parquet_path(self, symbol, source):
+        return os.path.join(self.csv_dir,
+                            symbol + '_' + source.value + '.parquet')
 
-    def _get_new_data(self, symbol):
+    def _read_parquet_cache(self, symbol, source):
         """
-        Returns the latest bar from the data feed as a tuple of
-        (sybmbol, datetime, open, low, high, close, volume).
+        Loads the data parsed for a symbol from the given source from
+        its 'symbol_SOURCE.parquet' cache, provided the cache is readable
+        and at least as recent as the CSV file. Returns True on a cache
+        hit.
         """
-        for row in self.symbol_data[symbol]:
-            yield tuple([symbol, row[0], row[1][0]])
-
-    def get_latest_data(self, symbol, N=1):
+        csv_path = os.path.join(self.csv_dir, symbol + '.csv')
+        pq_path = self._parquet_path(symbol, source)
+        if (os.path.exists(pq_path) and
+                os.path.getmtime(pq_path) >= os.path.getmtime(csv_path)):
+            df = _read_parquet(pq_path)
+            if df is not None:
+                self.symbol_data[symbol] = df
+                return True
+        return False
+
+    def _write_parquet_cache(self, symbol, source):
+        _write_parquet(self.symbol_data[symbol],
+                       self._parquet_path(symbol, source))
+
+    def _read_close_csv(self, symbol, close_col):
         """
-        Returns the last N bars from the latest_symbol list,
-        or N-k if less available.
+        Reads the date and close columns of 'symbol.csv' with the
+        pandas C parser. Returns a float32 'Close' frame indexed by
+        'Date'.
         """
-        try:
-            return self.latest_symbol_data[symbol][-N:]
-        except KeyError:
-            print("{symbol} is not a valid symbol.").format(symbol=symbol)
+        df = pd.read_csv(
+            os.path.join(self.csv_dir, symbol + '.csv'),
+            usecols=['Date', close_col],
+            index_col='Date',
+            parse_dates=True,
+            dtype={close_col: np.float32}
+        )
+        return df.rename(columns={close_col: 'Close'})
 
-    def update_latest_data(self):
+    def _stream_close_csv(self, symbol, close_col):
         """
-        Pushes the latest bar to the latest_symbol_data structure
-        for all symbols in the symbol list.
+        Reads the date and close columns of 'symbol.csv' with pyarrow's
+        record-batch reader; the other columns are never converted.
+        All batches are kept until the table is assembled, so the file
+        must still fit in memory. Files pyarrow rejects are read with
+        the C parser instead. Returns a float32 'Close' frame indexed
+        by 'Date'.
         """
-        for symbol in self.symbol_list:
-            data = None
-            try:
-                data = next(self._get_new_data(symbol))
-            except StopIteration:
-                self.continue_backtest = False
-            if data is not None:
-                self.latest_symbol_data[symbol].append(data)
+        read_options = pa_csv.ReadOptions(block_size=8 << 20)
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=['Date', close_col],
+            column_types={'Date': pa.timestamp('ns'),
+                          close_col: pa.float32()}
+        )
+        path = os.path.join(self.csv_dir, symbol + '.csv')
+        try:
+            with pa_csv.open_csv(
+                path,
+                read_options=read_options,
+                convert_options=convert_options
+            ) as reader:
+                table = pa.Table.from_batches(list(reader),
+                                              schema=reader.schema)
+        except pa.ArrowInvalid:
+            return self._read_close_csv(symbol, close_col)
+
+        df = table.to_pandas().set_index('Date')
+        return df.rename(columns={close_col: 'Close'})
 
-        self.events.put(MarketEvent())
+    def parse_yahoo_csv(self, symbol):
+        if self._read_parquet_cache(symbol, DataSource.YAHOO):
+            return
 
-    def create_baseline_dataframe(self):
-        dataframe = None
-        for symbol in self.symbol_list:
-            df = self.symbol_dataframe[symbol]
-            if dataframe is None:
-                dataframe = pd.DataFrame(df['Close'])
-                dataframe.columns = [symbol]
-            else:
-                dataframe[symbol] = pd.DataFrame(df['Close'])
-            dataframe[symbol] = dataframe[symbol].pct_change()
-            dataframe[symbol] = (1.0 + dataframe[symbol]).cumprod()
+        self.symbol_data[symbol] = self._stream_close_csv(symbol, 'Close')
+        self._write_parquet_cache(symbol, DataSource.YAHOO)
 
-        return dataframe
+    def parse_nasdaq_csv(self, symbol):
+        if self._read_parquet_cache(symbol, DataSource.NASDAQ):
+            return
 
-    def parse_yahoo_csv(self, symbol):
-        self.symbol_data[symbol] = pd.read_csv(
-            os.path.join(self.csv_dir, symbol + '.csv'),
-            header=0,
-            index_col=0,
-            parse_dates=True
-        )
+        # NASDAQ exports end with a row that is one field short of the
+        # header, which pyarrow rejects, so they go straight to the C
+        # parser; pyarrow is only used for Yahoo files.
+        tmp = self._read_close_csv(symbol, 'Closing price')
+        tmp.sort_index(inplace=True)
+        self.symbol_data[symbol] = tmp.query('Close > 0.0')
+        self._write_parquet_cache(symbol, DataSource.NASDAQ)
 
-    def parse_nasdaq_csv(self, symbol):
-        tmp = pd.read_csv(
-            os.path.join(self.csv_dir, symbol + '.csv'),
-            header=0,
-            index_col=0,
-            parse_dates=True
-        ).iloc[::-1]
-        self.symbol_data[symbol] = pd.DataFrame(tmp['Closing price'])
-        self.symbol_data[symbol].columns = ['Close']
-        # self.symbol_data[symbol]['Open'] = tmp['Closing price']
-        # self.symbol_data[symbol]['High'] = tmp['High price']
-        # self.symbol_data[symbol]['Low'] = tmp['Low price']
-        self.symbol_data[symbol]['Close'] = tmp['Closing price']
-        # self.symbol_data[symbol]['Adj Close'] = tmp['Closing price']
-        # self.symbol_data[symbol]['Volume'] = tmp['Total volume']
-        self.symbol_data[symbol] = (self.symbol_data[symbol]
-                                    [self.symbol_data[symbol]['Close'] > 0.0])
-
-
-class QuandlDataHandler(DataHandler):
+
+class QuandlDataHandler(HistoricDataHandler):
     def __init__(self, events, symbol_list, api_key, start_date='2000-01-01',
-                 end_date=None):
+                 end_date=None, cache_dir=None):
         quandl.ApiConfig.api_key = api_key
         self.events = events
         self.symbol_list = symbol_list
         self.start_date = start_date
         self.end_date = end_date
+        self.cache_dir = cache_dir
         if self.end_date is None:
             self.end_date = datetime.today().strftime('%Y-%m-%d')
 
         self.symbol_data = {}
         self.symbol_dataframe = {}
-        self.latest_symbol_data = {}
         self.all_data = {}
         self.continue_backtest = True
 
@@ -208,77 +401,60 @@ class QuandlDataHandler(DataHandler):
         self._load_convert_quandl_data()
 
     def _load_convert_quandl_data(self):
-        combined_index = None
-        for symbol in self.symbol_list:
-            self._get_nasdaq_data(symbol)
-
-            if combined_index is None:
-                combined_index = self.symbol_data[symbol].index
-            else:
-                combined_index.union(self.symbol_data[symbol].index)
-
-            self.latest_symbol_data[symbol] = []
-
-        for symbol in self.symbol_list:
-            self.symbol_dataframe[symbol] = self.symbol_data[symbol].reindex(
-                index=combined_index,
-                method='pad'
-            )
-            self.all_data[symbol] = self.symbol_dataframe[symbol].copy()
-            self.symbol_data[symbol] = self.symbol_dataframe[symbol].iterrows()
-
-    def _get_new_data(self, symbol):
-        for row in self.symbol_data[symbol]:
-            yield tuple([symbol, row[0], row[1][0]])
-
-    def get_latest_data(self, symbol, N=1):
-        try:
-            return self.latest_symbol_data[symbol][-N:]
-        except KeyError:
-            print("{symbol} is not a valid symbol.").format(symbol=symbol)
-
-    def update_latest_data(self):
-        for symbol in self.symbol_list:
-            data = None
-            try:
-                data = next(self._get_new_data(symbol))
-            except StopIteration:
-                self.continue_backtest = False
-            if data is not None:
-                self.latest_symbol_data[symbol].append(data)
-
-        self.events.put(MarketEvent())
-
-    def create_baseline_dataframe(self):
-        dataframe = None
-        for symbol in self.symbol_list:
-            df = self.symbol_dataframe[symbol]
-            if dataframe is None:
-                dataframe = pd.DataFrame(df['Close'])
-                dataframe.columns = [symbol]
-            else:
-                dataframe[symbol] = pd.DataFrame(df['Close'])
-            dataframe[symbol] = dataframe[symbol].pct_change()
-            dataframe[symbol] = (1.0 + dataframe[symbol]).cumprod()
-
-        return dataframe
+        downloads = [symbol for symbol in self.symbol_list
+                     if not self._read_cache(symbol)]
+        if downloads:
+            # Each request is dominated by network latency, so the
+            # downloads overlap and every frame is cleaned up as soon as
+            # its own download has finished.
+            max_workers = min(len(downloads), 16)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._get_nasdaq_data, symbol):
+                           symbol for symbol in downloads}
+                for future in as_completed(futures):
+                    self._convert_nasdaq_data(futures[future],
+                                              future.result())
+
+        self._build_close_matrix(self._combine_indices())
+
+    def _cache_path(self, symbol):
+        key = '|'.join([symbol, self.start_date, self.end_date])
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, symbol + '_' + digest + '.parquet')
+
+    def _read_cache(self, symbol):
+        """
+        Loads a previously downloaded symbol from the cache directory,
+        if caching is enabled. Returns True on a cache hit.
+        """
+        if self.cache_dir is not None:
+            cache_path = self._cache_path(symbol)
+            if os.path.exists(cache_path):
+                df = _read_parquet(cache_path)
+                if df is not None:
+                    self.symbol_data[symbol] = df
+                    return True
+        return False
 
     def _get_nasdaq_data(self, symbol):
-        self.symbol_data[symbol] = quandl.get(
+        return quandl.get(
             'NASDAQOMX/' + symbol,
             start_date=self.start_date,
             end_date=self.end_date
         )
-        self.symbol_data[symbol].drop(
+
+    def _convert_nasdaq_data(self, symbol, df):
+        df = df.drop(
             columns=[
                 'High',
                 'Low',
                 'Total Market Value',
                 'Dividend Market Value'
-            ],
-            inplace=True
+            ]
         )
-        self.symbol_data[symbol].columns = ['Close']
-        self.symbol_data[symbol].index.names = ['Date']
-        self.symbol_data[symbol] = (self.symbol_data[symbol]
-                                    [self.symbol_data[symbol]['Close'] > 0.0])
+        df.columns = ['Close']
+        df.index.names = ['Date']
+        self.symbol_data[symbol] = df[df['Close'] > 0.0].astype(np.float32)
+
+        if self.cache_dir is not None:
+            _write_parquet(self.symbol_data[symbol], self._cache_path(symbol))
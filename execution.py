@@ -28,4 +28,4 @@ class SimulateExecutionHandler(ExecutionHandler):
                     'ARCA',
                     event.quantity,
                     event.direction, 0)
-                self.events.put(fill_event)
+                self.events.append(fill_event)
@@ -1,4 +1,4 @@
-import queue
+from collections import deque
 # import time
 # import config
 # from datetime import datetime
@@ -18,11 +18,8 @@ def backtest(events, data, portfolio, strategy, broker):
         if data.continue_backtest is False:
             break
 
-        while True:
-            try:
-                event = events.get(block=False)
-            except queue.Empty:
-                break
+        while events:
+            event = events.popleft()
 
             if event is not None:
                 if event.type == 'MARKET':
@@ -47,7 +44,7 @@ def backtest(events, data, portfolio, strategy, broker):
 
 # for s in [5, 10, 50, 100, 200]:
 #     for l in [s+10, s+50, s+100, s+200]:
-#         events = queue.Queue()
+#         events = deque()
 #         data = HistoricCSVDataHandler(
 #             events, 'csv/', ['OMXS30'], DataSource.NASDAQ)
 #         # data = QuandlDataHandler(events, ['OMXS30'], config.API_KEY)
@@ -74,7 +71,7 @@ def backtest(events, data, portfolio, strategy, broker):
 #         print('----------')
 
 
-events = queue.Queue()
+events = deque()
 data = HistoricCSVDataHandler(events, 'csv/', ['OMXS30'], DataSource.NASDAQ)
 portfolio = NaivePortfolio(data, events, '', initial_capital=2000)
 strategy = MovingAveragesLongStrategy(
@@ -119,7 +119,7 @@ class NaivePortfolio(Portfolio):
     def update_signal(self, event):
         if event.type == 'SIGNAL':
             order_event = self.generate_naive_order(event)
-            self.events.put(order_event)
+            self.events.append(order_event)
 
     def create_equity_curve_dataframe(self):
         curve = pd.DataFrame(self.all_holdings)
@@ -31,7 +31,7 @@ class DivideAndConquerStrategy(Strategy):
                             signal = SignalEvent(
                                 symbol,
                                 data[-1][self.data.time_col], 'LONG', quantity)
-                            self.events.put(signal)
+                            self.events.append(signal)
                             print("Long:",
                                   data[-1][self.data.time_col], latest_close)
                     else:
@@ -42,6 +42,6 @@ class DivideAndConquerStrategy(Strategy):
                                                  data[-1][self.data.time_col],
                                                  'EXIT',
                                                  quantity)
-                            self.events.put(signal)
+                            self.events.append(signal)
                             print("Exit:", data[-1][self.data.time_col],
                                   latest_close)
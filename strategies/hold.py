@@ -35,7 +35,7 @@ class BuyAndHoldStrategy(Strategy):
                                              data[0][self.data.time_col],
                                              'LONG',
                                              quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         self.bought[symbol] = True
 
 
@@ -69,5 +69,5 @@ class SellAndHoldStrategy(Strategy):
                                              data[0][self.data.time_col],
                                              'SHORT',
                                              quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         self.bought[symbol] = True
@@ -69,14 +69,13 @@ class MovingAveragesLongStrategy(Strategy):
     def calculate_signals(self, event):
         if event.type == 'MARKET':
             for symbol in self.symbol_list:
-                data = self.data.get_latest_data(symbol, N=-1)
-                df = pd.DataFrame(data, columns=['Symbol', 'Date', 'Close'])
-                df = df.drop(['Symbol'], axis=1)
-                df.set_index('Date', inplace=True)
-                if data is not None and len(data) >= self.long_period:
+                dates, closes = self.data.get_latest_arrays(symbol, N=-1)
+                df = pd.DataFrame({'Close': closes},
+                                  index=pd.Index(dates, name='Date'))
+                if len(df) >= self.long_period:
                     price_short, price_long = self.calculate_long_short(df)
                     date = df.index.values[-1]
-                    price = df['Close'][-1]
+                    price = float(df['Close'][-1])
                     self.strategy[symbol] = self.strategy[symbol].append(
                         {'Date': date,
                          'Short': price_short,
@@ -87,7 +86,7 @@ class MovingAveragesLongStrategy(Strategy):
                         quantity = math.floor(
                             self.portfolio.current_holdings['cash'] / price)
                         signal = SignalEvent(symbol, date, 'LONG', quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         self.bought[symbol] = True
                         self.signals[symbol] = self.signals[symbol].append(
                             {'Signal': quantity,
@@ -99,7 +98,7 @@ class MovingAveragesLongStrategy(Strategy):
                             price_short < price_long):
                         quantity = self.portfolio.current_positions[symbol]
                         signal = SignalEvent(symbol, date, 'EXIT', quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         self.bought[symbol] = False
                         self.signals[symbol] = self.signals[symbol].append(
                             {'Signal': -quantity, 'Date': date},
@@ -212,14 +211,13 @@ class MovingAveragesLongShortStrategy(Strategy):
     def calculate_signals(self, event):
         if event.type == 'MARKET':
             for symbol in self.symbol_list:
-                data = self.data.get_latest_data(symbol, N=-1)
-                df = pd.DataFrame(data, columns=['Symbol', 'Date', 'Close'])
-                df = df.drop(['Symbol'], axis=1)
-                df.set_index('Date', inplace=True)
-                if data is not None and len(data) >= self.long_period:
+                dates, closes = self.data.get_latest_arrays(symbol, N=-1)
+                df = pd.DataFrame({'Close': closes},
+                                  index=pd.Index(dates, name='Date'))
+                if len(df) >= self.long_period:
                     price_short, price_long = self.calculate_long_short(df)
-                    date = data[-1][self.data.time_col]
-                    price = data[-1][self.data.price_col]
+                    date = df.index[-1]
+                    price = float(closes[-1])
                     if (self.bought[symbol] is False and
                             price_short > price_long):
                         current_positions = self.portfolio.current_positions[
@@ -231,9 +229,9 @@ class MovingAveragesLongShortStrategy(Strategy):
                         signal = SignalEvent(symbol, date, 'EXIT', math.fabs(
                             current_positions)
                             )
-                        self.events.put(signal)
+                        self.events.append(signal)
                         signal = SignalEvent(symbol, date, 'LONG', quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         self.bought[symbol] = True
                         self.signals[symbol] = self.signals[
                             symbol
@@ -247,9 +245,9 @@ class MovingAveragesLongShortStrategy(Strategy):
                             price_short < price_long):
                         quantity = self.portfolio.current_positions[symbol]
                         signal = SignalEvent(symbol, date, 'EXIT', quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         signal = SignalEvent(symbol, date, 'SHORT', quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         self.bought[symbol] = False
                         self.signals[symbol] = self.signals[
                             symbol
@@ -344,16 +342,15 @@ class MovingAveragesMomentumStrategy(Strategy):
     def calculate_signals(self, event):
         if event.type == 'MARKET':
             for symbol in self.symbol_list:
-                data = self.data.get_latest_data(symbol, N=-1)
-                df = pd.DataFrame(data, columns=['Symbol', 'Date', 'Close'])
-                df = df.drop(['Symbol'], axis=1)
-                df.set_index('Date', inplace=True)
-                if data is not None and len(data) >= self.long_period:
+                dates, closes = self.data.get_latest_arrays(symbol, N=-1)
+                df = pd.DataFrame({'Close': closes},
+                                  index=pd.Index(dates, name='Date'))
+                if len(df) >= self.long_period:
                     price_short, price_long = self.calculate_long_short(df)
                     diff = price_long - price_short
                     factor = math.fabs(2*math.atan(diff) / math.pi)
-                    date = data[-1][self.data.time_col]
-                    price = data[-1][self.data.price_col]
+                    date = df.index[-1]
+                    price = float(closes[-1])
                     if price_short >= price_long:
                         quantity = math.floor(
                             factor * self.portfolio.current_holdings[
@@ -361,7 +358,7 @@ class MovingAveragesMomentumStrategy(Strategy):
                         if quantity != 0:
                             signal = SignalEvent(
                                 symbol, date, 'LONG', quantity)
-                            self.events.put(signal)
+                            self.events.append(signal)
                             if self.verbose:
                                 print('Long', date, price)
                     else:
@@ -371,6 +368,6 @@ class MovingAveragesMomentumStrategy(Strategy):
                         if quantity != 0:
                             signal = SignalEvent(
                                 symbol, date, 'SHORT', quantity)
-                            self.events.put(signal)
+                            self.events.append(signal)
                             if self.verbose:
                                 print('Short', date, price)
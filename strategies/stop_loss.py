@@ -48,7 +48,7 @@ class StopLossStrategy(Strategy):
                             data[-1][self.data.time_col],
                             'LONG',
                             quantity)
-                        self.events.put(signal)
+                        self.events.append(signal)
                         self.bought[symbol] = True
                         self.stop_loss[symbol] = self.stop_loss_percentage \
                             * latest_close
@@ -62,7 +62,7 @@ class StopLossStrategy(Strategy):
                             signal = SignalEvent(
                                 symbol,
                                 data[-1][self.data.time_col], 'EXIT', quantity)
-                            self.events.put(signal)
+                            self.events.append(signal)
                             self.bought[symbol] = False
                             print("Exit:",
                                   data[-1][self.data.time_col],